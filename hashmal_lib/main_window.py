@@ -338,7 +338,7 @@ class HashmalMain(QMainWindow):
         menu = QMenu(self)
         plugins_menu = menu.addMenu('All Plugins')
         for p in sorted(self.plugin_handler.loaded_plugins, key = lambda x: x.name):
-            if not p.has_gui:
+            if not p.has_gui or not p.ui_instantiated:
                 continue
             plugins_menu.addAction(p.ui.toggleViewAction())
         return menu
@@ -1,9 +1,13 @@
 from functools import partial
-from pkg_resources import iter_entry_points
 from collections import OrderedDict
+import bisect
 import logging
 import sys
 import __builtin__
+try:
+    from importlib.metadata import entry_points
+except ImportError:
+    from importlib_metadata import entry_points
 
 from PyQt4.QtGui import *
 from PyQt4.QtCore import *
@@ -12,6 +16,36 @@ from gui_utils import required_plugins, default_plugins, add_shortcuts, hashmal_
 import plugins
 from plugins.base import Category
 
+_REQUIRED_SET = frozenset(required_plugins)
+
+# Sorted plugin category names.
+_SORTED_CATEGORIES = None
+
+# Shortcuts for favorite plugins (Alt+1 through Alt+9), created on first use.
+_ALT_SHORTCUTS = None
+# Shortcut for plugins that aren't among the first nine favorites.
+_EMPTY_SHORTCUT = None
+
+# (name, plugin_maker) pairs from the 'hashmal.plugin' entry point group.
+_PLUGIN_ENTRY_CACHE = None
+
+def _discover_plugin_makers():
+    """Return the plugin makers advertised by installed distributions.
+
+    Entry point discovery reads every distribution's metadata, so
+    the result is cached for the lifetime of the process.
+    """
+    global _PLUGIN_ENTRY_CACHE
+    if _PLUGIN_ENTRY_CACHE is None:
+        eps = entry_points()
+        group = eps.select(group='hashmal.plugin') if hasattr(eps, 'select') else eps.get('hashmal.plugin', [])
+        _PLUGIN_ENTRY_CACHE = [(ep.name, ep.load()) for ep in group]
+    return _PLUGIN_ENTRY_CACHE
+
+def _item_slot(func, item):
+    """Return a slot that calls func with item."""
+    return lambda: func(item)
+
 
 class Augmentation(object):
     """Model of an augmentation.
@@ -38,13 +72,27 @@ class Augmentation(object):
     def __str__(self):
         return '%s.%s' % (self.augmenter_plugin.name, self.hook_name)
 
-class Augmentations(list):
+class Augmentations(object):
     """Container for Augmentation instances."""
+    def __init__(self, augmentations=()):
+        self._augmentations = []
+        # First augmentation for each (plugin name, hook name).
+        self._index = {}
+        for i in augmentations:
+            self.append(i)
+
+    def __iter__(self):
+        return iter(self._augmentations)
+
+    def __len__(self):
+        return len(self._augmentations)
+
+    def append(self, augmentation):
+        self._augmentations.append(augmentation)
+        self._index.setdefault((augmentation.augmenter_plugin.name, augmentation.hook_name), augmentation)
+
     def get(self, plugin_name, hook_name):
-        for i in self:
-            if i.augmenter_plugin.name == plugin_name and i.hook_name == hook_name:
-                return i
-        return None
+        return self._index.get((plugin_name, hook_name))
 
     def for_plugin(self, plugin_name):
         """Return an Augmentations instance with augmenters in plugin_name."""
@@ -62,62 +110,87 @@ class PluginHandler(QWidget):
         self.gui = main_window
         self.config = main_window.config
         self.loaded_plugins = []
+        # Loaded plugins by name.
+        self._plugin_by_name = {}
+        # Plugins that have an augmenter, by hook name.
+        self._augmenter_index = {}
+        # (plugin name, dock) for each instantiated dock, in loaded_plugins order.
+        self._docks = []
+        # Plugin names of _docks, for finding insertion points.
+        self._dock_names = []
         self.config.optionChanged.connect(self.on_option_changed)
         # Whether the initial plugin loading is done.
         self.plugins_loaded = False
-        # Augmentations waiting until all plugins load.
-        self.waiting_augmentations = []
+        # Augmentations waiting until all plugins load, in request order.
+        self.waiting_augmentations = OrderedDict()
         # Augmentations collection.
         self.augmentations = Augmentations()
+        # Favorites and enabled states that dock shortcuts were last assigned for.
+        self._last_shortcut_state = None
+        # Menu that plugin docks are listed in, and its submenus by category name.
+        self._plugins_menu = None
+        self._category_menus = {}
+        # Whether the default dock layout is done.
+        self.layout_done = False
+        # Last docks placed on the right and bottom.
+        self._last_small = self._last_large = None
 
     def get_plugin(self, plugin_name):
-        for plugin in self.loaded_plugins:
-            if plugin.name == plugin_name:
-                return plugin
-        return None
+        return self._plugin_by_name.get(plugin_name)
 
     def plugin_is_enabled(self, plugin_name):
         plugin = self.get_plugin(plugin_name)
         if plugin:
-            return plugin.ui.is_enabled
+            return plugin.is_enabled
         return False
 
     def create_menu(self, menu):
-        """Add plugins to menu."""
-        _categories = OrderedDict()
-        for c in sorted([x[0] for x in Category.categories()]):
-            _categories[c] = []
-        for plugin in self.loaded_plugins:
-            if not plugin.has_gui:
-                continue
-            _categories[plugin.ui.category[0]].append(plugin)
-
-        shortcuts = add_shortcuts(_categories.keys())
-        categories = OrderedDict()
-        for k, v in zip(shortcuts, _categories.values()):
-            categories[k] = v
-        for i in categories.keys():
-            plugins = categories[i]
-            if len(plugins) == 0:
-                continue
+        """Add plugins to menu.
+
+        Only plugins whose UI has been instantiated are added. Docks
+        instantiated later are added to their category's submenu, and
+        the menu is only rebuilt when a category gets its first dock.
+        """
+        global _SORTED_CATEGORIES
+        self._plugins_menu = menu
+        for category_menu in self._category_menus.values():
+            menu.removeAction(category_menu.menuAction())
+            category_menu.deleteLater()
+        self._category_menus = {}
+
+        if _SORTED_CATEGORIES is None:
+            _SORTED_CATEGORIES = sorted(x[0] for x in Category.categories())
+        _categories = dict((c, []) for c in _SORTED_CATEGORIES)
+        for _, dock in self._docks:
+            _categories[dock.category[0]].append(dock)
+
+        # Only non-empty categories get a menu (and a shortcut).
+        non_empty = [(c, _categories[c]) for c in _SORTED_CATEGORIES if _categories[c]]
+        shortcuts = add_shortcuts([c for c, _ in non_empty])
+        for i, (category_name, docks) in zip(shortcuts, non_empty):
             category_menu = menu.addMenu(i)
-            for plugin in sorted(plugins, key = lambda x: x.name):
-                category_menu.addAction(plugin.ui.toggleViewAction())
+            self._category_menus[category_name] = category_menu
+            # loaded_plugins is sorted by name, so docks already are.
+            for dock in docks:
+                category_menu.addAction(dock.toggleViewAction())
 
     def load_plugin(self, plugin_maker, name):
         plugin_instance = plugin_maker()
 
         tool_name = plugin_instance.ui_class.tool_name
         plugin_instance.name = tool_name if tool_name else name
-        plugin_instance.instantiate_ui(self)
+        category = plugin_instance.ui_class.category
         # Only required plugins can be Core plugins.
-        if plugin_instance.ui.category == Category.Core and tool_name not in required_plugins:
+        if category == Category.Core and tool_name not in _REQUIRED_SET:
             return
         # Don't load plugins with unknown category metadata.
-        if plugin_instance.ui.category not in Category.categories():
+        if category not in Category.categories():
             return
 
+        # The UI is instantiated when the plugin is enabled or first used.
+        plugin_instance.handler = self
         self.loaded_plugins.append(plugin_instance)
+        self._plugin_by_name.setdefault(plugin_instance.name, plugin_instance)
 
     def load_plugins(self):
         """Load plugins from entry points."""
@@ -129,22 +202,75 @@ class PluginHandler(QWidget):
                 plugin_maker = getattr(module, plugin_maker_name)
                 self.load_plugin(plugin_maker, plugin_name)
         else:
-            for entry_point in iter_entry_points(group='hashmal.plugin'):
-                plugin_maker = entry_point.load()
-                self.load_plugin(plugin_maker, entry_point.name)
+            for name, plugin_maker in _discover_plugin_makers():
+                self.load_plugin(plugin_maker, name)
+        self.loaded_plugins.sort(key = lambda x: x.name)
 
         # Fail if core plugins aren't present.
         for req in required_plugins:
-            if req not in [i.name for i in self.loaded_plugins]:
+            if req not in self._plugin_by_name:
                 print('Required plugin "{}" not found.\nTry running setup.py.'.format(req))
                 sys.exit(1)
 
         self.update_enabled_plugins()
         self.enable_required_plugins()
+        for req in required_plugins:
+            self.instantiate_plugin_ui(self.get_plugin(req))
+        self.build_augmenter_index()
         self.plugins_loaded = True
-        for i in self.waiting_augmentations:
+        for i in self.waiting_augmentations.values():
             self.do_augment_hook(*i)
 
+    def build_augmenter_index(self):
+        """Index loaded plugins by the augmentation hooks they implement."""
+        self._augmenter_index = {}
+        for plugin in self.loaded_plugins:
+            for hook_name in plugin.augmenters() or ():
+                self._augmenter_index.setdefault(hook_name, []).append(plugin)
+
+    def instantiate_plugin_ui(self, plugin):
+        """Instantiate a plugin's UI if it has not been instantiated yet."""
+        if plugin.ui_instantiated:
+            return
+        plugin.instantiate_ui(self)
+        ui = plugin.ui
+        ui.is_enabled = plugin.is_enabled
+        if not plugin.has_gui:
+            return
+        # loaded_plugins is sorted by name, so inserting by name keeps its order.
+        idx = bisect.bisect_right(self._dock_names, plugin.name)
+        self._dock_names.insert(idx, plugin.name)
+        self._docks.insert(idx, (plugin.name, ui))
+        if self.layout_done:
+            if self.gui.restoreDockWidget(ui):
+                self.register_dock_order(ui)
+            else:
+                self.place_dock(ui)
+                ui.setVisible(False)
+            # A restored layout may show a dock whose plugin is disabled.
+            if not plugin.is_enabled:
+                ui.setVisible(False)
+        if self._plugins_menu is not None:
+            self.add_dock_to_menu(idx)
+        if self.plugins_loaded:
+            self.assign_dock_shortcuts()
+
+    def add_dock_to_menu(self, idx):
+        """Add the dock at idx in _docks to the plugins menu."""
+        dock = self._docks[idx][1]
+        category_name = dock.category[0]
+        category_menu = self._category_menus.get(category_name)
+        # The category is new to the menu, so shortcuts must be reassigned.
+        if category_menu is None:
+            self.create_menu(self._plugins_menu)
+            return
+        # Insert before the next dock in the same category.
+        for _, other in self._docks[idx + 1:]:
+            if other.category[0] == category_name:
+                category_menu.insertAction(other.toggleViewAction(), dock.toggleViewAction())
+                return
+        category_menu.addAction(dock.toggleViewAction())
+
     def set_plugin_enabled(self, plugin_name, is_enabled):
         """Enable or disable a plugin and its UI."""
         plugin = self.get_plugin(plugin_name)
@@ -152,14 +278,17 @@ class PluginHandler(QWidget):
             return
 
         # Do not disable required plugins.
-        if not is_enabled and plugin_name in required_plugins:
+        if not is_enabled and plugin_name in _REQUIRED_SET:
             return
 
-        plugin.ui.is_enabled = is_enabled
-        if plugin.has_gui:
-            self.set_dock_signals(plugin.ui, is_enabled)
-            if not is_enabled:
-                plugin.ui.setVisible(False)
+        plugin.is_enabled = is_enabled
+        # Disabled plugins' UIs are not instantiated just to disable them.
+        if plugin.ui_instantiated or is_enabled:
+            plugin.ui.is_enabled = is_enabled
+            if plugin.has_gui:
+                self.set_dock_signals(plugin.ui, is_enabled)
+                if not is_enabled:
+                    plugin.ui.setVisible(False)
 
         if is_enabled:
             # Run augmentations that were disabled.
@@ -179,26 +308,39 @@ class PluginHandler(QWidget):
 
     def set_dock_signals(self, dock, do_connect):
         """Connect or disconnect Qt signals to/from a dock."""
+        # Skip if the signals are already in the requested state.
+        if do_connect == getattr(dock, '_signals_connected', False):
+            return
         if do_connect:
             dock.needsFocus.connect(partial(self.bring_to_front, dock))
         else:
-            try:
-                dock.needsFocus.disconnect()
-            except TypeError:
-                pass
+            dock.needsFocus.disconnect()
+        dock._signals_connected = do_connect
 
     def assign_dock_shortcuts(self):
         """Assign shortcuts to visibility-toggling actions."""
+        global _ALT_SHORTCUTS, _EMPTY_SHORTCUT
         favorites = self.gui.config.get_option('favorite_plugins', [])
-        for plugin in self.loaded_plugins:
-            if not plugin.has_gui:
-                continue
-            ui = plugin.ui
+        # Skip reassignment if nothing changed since last time.
+        state = (tuple(favorites), tuple((name, dock.is_enabled) for name, dock in self._docks))
+        if state == self._last_shortcut_state:
+            return
+        self._last_shortcut_state = state
+
+        if _ALT_SHORTCUTS is None:
+            _ALT_SHORTCUTS = [QKeySequence('Alt+%d' % i) for i in range(1, 10)]
+            _EMPTY_SHORTCUT = QKeySequence()
+        fav_index = {}
+        for i, name in enumerate(favorites):
+            fav_index.setdefault(name, i)
+        for name, dock in self._docks:
+            action = dock.toggleViewAction()
             # Keyboard shortcut
-            shortcut = 'Alt+' + str(1 + favorites.index(plugin.name)) if plugin.name in favorites else ''
-            ui.toggleViewAction().setShortcut(shortcut)
-            ui.toggleViewAction().setEnabled(ui.is_enabled)
-            ui.toggleViewAction().setVisible(ui.is_enabled)
+            idx = fav_index.get(name)
+            shortcut = _ALT_SHORTCUTS[idx] if idx is not None and idx < len(_ALT_SHORTCUTS) else _EMPTY_SHORTCUT
+            action.setShortcut(shortcut)
+            action.setEnabled(dock.is_enabled)
+            action.setVisible(dock.is_enabled)
 
     def add_plugin_actions(self, instance, menu, data):
         """Add the relevant actions to a context menu.
@@ -215,6 +357,7 @@ class PluginHandler(QWidget):
         if not items:
             return
 
+        requester_name = instance.tool_name
         menu_has_separator = False
         # Add the item's own actions.
         for item in items:
@@ -235,42 +378,41 @@ class PluginHandler(QWidget):
 
             # Add a menu for relevant plugins in sorted order.
             for plugin_name in sorted(actions.keys()):
-                if plugin_name == instance.tool_name:
+                if plugin_name == requester_name:
                     continue
                 plugin_menu = menu.addMenu(plugin_name)
 
                 # Add the plugin's actions to its menu.
                 plugin_actions = actions[plugin_name]
                 for label, func in plugin_actions:
-                    plugin_menu.addAction(label, partial(func, item))
+                    plugin_menu.addAction(label, _item_slot(func, item))
 
     def do_augment_hook(self, class_name, hook_name, data, callback=None):
         """Consult plugins that can augment hook_name."""
         # Don't hook until initial plugin loading is done.
         if not self.plugins_loaded:
-            augmentation = (class_name, hook_name, data, callback)
-            if not augmentation in self.waiting_augmentations:
-                self.waiting_augmentations.append(augmentation)
+            # data may be unhashable, so it is keyed by identity.
+            key = (class_name, hook_name, id(data), callback)
+            if key not in self.waiting_augmentations:
+                self.waiting_augmentations[key] = (class_name, hook_name, data, callback)
             return
-        for plugin in self.loaded_plugins:
-            if hook_name in plugin.augmenters():
-
-                augmentation = self.augmentations.get(plugin.name, hook_name)
-                if augmentation is None:
-                    augmentation = Augmentation(plugin, hook_name, requester=class_name, data=data, callback=callback)
-                    self.augmentations.append(augmentation)
-
-                augmentation = self.augmentations.get(plugin.name, hook_name)
-                if augmentation is None:
-                    continue
-
-                # Don't hook disabled plugins.
-                if plugin.name not in self.config.get_option('enabled_plugins', default_plugins):
-                    augmentation.is_enabled = False
-                    continue
+        augmenter_plugins = self._augmenter_index.get(hook_name)
+        # Nothing to do if no plugin implements the hook.
+        if not augmenter_plugins:
+            return
+        for plugin in augmenter_plugins:
+            augmentation = self.augmentations.get(plugin.name, hook_name)
+            if augmentation is None:
+                augmentation = Augmentation(plugin, hook_name, requester=class_name, data=data, callback=callback)
+                self.augmentations.append(augmentation)
+
+            # Don't hook disabled plugins.
+            if plugin.name not in self.config.get_option('enabled_plugins', default_plugins):
+                augmentation.is_enabled = False
+                continue
 
-                # Call the augmenter method.
-                self.do_augment(augmentation)
+            # Call the augmenter method.
+            self.do_augment(augmentation)
 
     def do_augment(self, augmentation):
         """Call the augmenter for an Augmentation."""
@@ -279,7 +421,7 @@ class PluginHandler(QWidget):
         if (
             augmentation.has_run or
             not augmentation.is_enabled or
-            augmentation.requester == augmentation.augmenter_plugin.ui.__class__.__name__
+            augmentation.requester == augmentation.augmenter_plugin.ui_class.__name__
         ): return
         func = augmentation.augmenter_plugin.get_augmenter(augmentation.hook_name)
         data = func(augmentation.data)
@@ -292,9 +434,8 @@ class PluginHandler(QWidget):
         """Get a list of plugins that claim to be able to retrieve blockchain data."""
         retrievers = []
         for plugin in self.loaded_plugins:
-            dock = plugin.ui
-            if not dock.is_enabled: continue
-            if hasattr(dock, 'retrieve_blockchain_data'):
+            if not plugin.is_enabled: continue
+            if hasattr(plugin.ui_class, 'retrieve_blockchain_data'):
                 retrievers.append(plugin)
         return retrievers
 
@@ -320,28 +461,50 @@ class PluginHandler(QWidget):
         if not script_hex: return
         self.get_plugin('Stack Evaluator').ui.evaluate_script(script_hex)
 
-    def do_default_layout(self):
-        last_small = last_large = None
-        for plugin in self.loaded_plugins:
-            if not plugin.has_gui:
-                continue
-            dock = plugin.ui
-            # Large docks go to the bottom.
-            if dock.is_large:
-                self.gui.addDockWidget(Qt.BottomDockWidgetArea, dock)
-                if last_large:
-                    self.gui.tabifyDockWidget(last_large, dock)
-                last_large = dock
-            # Small docks go to the right.
-            else:
-                self.gui.addDockWidget(Qt.RightDockWidgetArea, dock)
-                if last_small:
-                    self.gui.tabifyDockWidget(last_small, dock)
-                last_small = dock
-            dock.setVisible(False)
+    def register_dock_order(self, dock):
+        """Add a dock that was not tabified to the main window's dock order."""
+        docks = self.gui.dock_orders[self.gui.dockWidgetArea(dock)]
+        if dock not in docks:
+            docks.append(dock)
+
+    def place_dock(self, dock):
+        """Add a dock to the main window in its default area."""
+        # Large docks go to the bottom, small docks go to the right.
+        if dock.is_large:
+            area, last = Qt.BottomDockWidgetArea, self._last_large
+        else:
+            area, last = Qt.RightDockWidgetArea, self._last_small
+        self.gui.addDockWidget(area, dock)
+        # The last placed dock may have been moved by a restored layout or the user.
+        docks = self.gui.dock_orders[area]
+        if last and self.gui.dockWidgetArea(last) == area and (not docks or last in docks):
+            self.gui.tabifyDockWidget(last, dock)
+        else:
+            self.register_dock_order(dock)
+
+        if dock.is_large:
+            self._last_large = dock
+        else:
+            self._last_small = dock
 
-        self.get_plugin('Variables').ui.setVisible(True)
-        self.get_plugin('Stack Evaluator').ui.setVisible(True)
+    def do_default_layout(self):
+        # Hold off repaints and main window signals until all docks are placed.
+        self.gui.setUpdatesEnabled(False)
+        signals_were_blocked = self.gui.blockSignals(True)
+        try:
+            self._last_small = self._last_large = None
+            place_dock = self.place_dock
+            for _, dock in self._docks:
+                place_dock(dock)
+                dock.setVisible(False)
+            # Docks instantiated from now on are placed as they are created.
+            self.layout_done = True
+
+            self.get_plugin('Variables').ui.setVisible(True)
+            self.get_plugin('Stack Evaluator').ui.setVisible(True)
+        finally:
+            self.gui.blockSignals(signals_were_blocked)
+            self.gui.setUpdatesEnabled(True)
 
     def enable_required_plugins(self):
         """Ensure that all required plugins are enabled."""
@@ -356,7 +519,7 @@ class PluginHandler(QWidget):
 
     def update_enabled_plugins(self):
         """Enable or disable plugin docks according to config file."""
-        enabled_plugins = self.config.get_option('enabled_plugins', default_plugins)
+        enabled_plugins = set(self.config.get_option('enabled_plugins', default_plugins))
         for plugin in self.loaded_plugins:
             is_enabled = plugin.name in enabled_plugins
             self.set_plugin_enabled(plugin.name, is_enabled)
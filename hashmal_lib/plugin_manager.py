@@ -56,7 +56,7 @@ class PluginsModel(QAbstractTableModel):
             if role in [Qt.DisplayRole, Qt.ToolTipRole, Qt.EditRole]:
                 data = plugin.name
         elif col == 1:
-            category_name, category_desc = plugin.ui.category
+            category_name, category_desc = plugin.ui_class.category
             if role in [Qt.DisplayRole, Qt.EditRole]:
                 data = category_name
             elif role in [Qt.ToolTipRole]:
@@ -85,7 +85,7 @@ class PluginsModel(QAbstractTableModel):
                 data = has_gui
         elif col == 5:
             if role in [Qt.DisplayRole, Qt.EditRole]:
-                data = plugin.ui.description
+                data = plugin.ui_class.description
 
         return QVariant(data)
 
@@ -174,7 +174,7 @@ class PluginsProxyModel(QSortFilterProxyModel):
     def filterAcceptsRow(self, source_row, source_parent):
         if self.hide_core_plugins:
             plugin = self.sourceModel().plugin_for_row(source_row)
-            if plugin.ui.category == Category.Core:
+            if plugin.ui_class.category == Category.Core:
                 return False
         if self.name_filter:
             idx = self.sourceModel().index(source_row, 0, source_parent)
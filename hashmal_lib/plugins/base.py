@@ -55,18 +55,42 @@ class Plugin(object):
     """
     def __init__(self, ui_class):
         self.ui_class = ui_class
-        self.ui = None
+        self._ui = None
+        # handler is set when the entry point is loaded.
+        # The UI is instantiated with it on first access.
+        self.handler = None
         # name is set when the entry point is loaded.
         self.name = ''
         # If False, plugin has no dedicated GUI.
         self.has_gui = True
+        self.is_enabled = True
+        # Whether the UI's constructor is running.
+        self._instantiating = False
+
+    @property
+    def ui(self):
+        if self._ui is None and self.handler is not None:
+            self.handler.instantiate_plugin_ui(self)
+        return self._ui
+
+    @property
+    def ui_instantiated(self):
+        return self._ui is not None
 
     def instantiate_ui(self, plugin_handler):
-        instance = self.ui_class(plugin_handler)
-        self.ui = instance
+        if self._instantiating:
+            raise Exception('Plugin "%s" UI was accessed while it was being instantiated.' % self.name)
+        self._instantiating = True
+        try:
+            instance = self.ui_class(plugin_handler)
+        finally:
+            self._instantiating = False
+        self._ui = instance
 
     def augmenters(self):
-        return self.ui.augmenters if self.ui else None
+        if self._ui is not None:
+            return self._ui.augmenters
+        return [name for name in dir(self.ui_class) if name in known_augmenters]
 
     def get_augmenter(self, hook_name):
         return getattr(self.ui, hook_name) if self.ui else None
@@ -40,6 +40,9 @@ ItemAction = namedtuple('ItemAction', ('plugin_name', 'item_type', 'label', 'fun
 item_types = []
 # List of ItemAction instances.
 item_actions = []
+# Results of get_actions() by item type name.
+# Cleared whenever item_actions changes.
+_actions_by_type = {}
 
 def instantiate_item(data, allow_multiple=False):
     """Attempt to instantiate an item with the value of data.
@@ -60,15 +63,20 @@ def get_actions(name):
     """Get actions for an item type.
 
     Returns:
-        A list of dicts of the form:
-            {plugin_name: [(action_label, action_function), ...]}
+        A dict of the form:
+            {plugin_name: ((action_label, action_function), ...)}
     """
-    actions = defaultdict(list)
-    for i in item_actions:
-        if i.item_type == name:
-            actions[i.plugin_name].append( (i.label, i.func) )
-
-    return actions
+    actions = _actions_by_type.get(name)
+    if actions is None:
+        grouped = defaultdict(list)
+        for i in item_actions:
+            if i.item_type == name:
+                grouped[i.plugin_name].append( (i.label, i.func) )
+        actions = dict((k, tuple(v)) for k, v in grouped.items())
+        _actions_by_type[name] = actions
+
+    # Callers get their own dict so they can't change the cached one.
+    return dict(actions)
 
 class TxItem(Item):
     name = 'Transaction'
@@ -213,6 +221,7 @@ class ItemsPlugin(BasePluginUI):
         self.itemTypesChanged.emit(item_types)
 
     def on_item_actions_augmented(self, data):
+        _actions_by_type.clear()
         if isinstance(data, ItemAction):
             item_actions.append(data)
             return
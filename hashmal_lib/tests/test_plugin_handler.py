@@ -0,0 +1,46 @@
+import unittest
+
+from hashmal_lib.plugin_handler import Augmentation, Augmentations
+
+class FakePlugin(object):
+    def __init__(self, name):
+        self.name = name
+
+class AugmentationsTest(unittest.TestCase):
+    def setUp(self):
+        self.foo = FakePlugin('Foo')
+        self.bar = FakePlugin('Bar')
+        self.augmentations = Augmentations()
+        self.foo_types = Augmentation(self.foo, 'item_types')
+        self.foo_actions = Augmentation(self.foo, 'item_actions')
+        self.bar_types = Augmentation(self.bar, 'item_types')
+        for i in [self.foo_types, self.foo_actions, self.bar_types]:
+            self.augmentations.append(i)
+
+    def test_get(self):
+        self.assertIs(self.foo_types, self.augmentations.get('Foo', 'item_types'))
+        self.assertIs(self.foo_actions, self.augmentations.get('Foo', 'item_actions'))
+        self.assertIs(self.bar_types, self.augmentations.get('Bar', 'item_types'))
+        self.assertIs(None, self.augmentations.get('Bar', 'item_actions'))
+        self.assertIs(None, self.augmentations.get('Baz', 'item_types'))
+
+    def test_get_returns_first_match(self):
+        self.augmentations.append(Augmentation(self.foo, 'item_types'))
+        self.assertEqual(4, len(self.augmentations))
+        self.assertIs(self.foo_types, self.augmentations.get('Foo', 'item_types'))
+
+    def test_for_plugin(self):
+        foo_augmentations = self.augmentations.for_plugin('Foo')
+        self.assertIsInstance(foo_augmentations, Augmentations)
+        self.assertEqual([self.foo_types, self.foo_actions], list(foo_augmentations))
+        self.assertIs(self.foo_actions, foo_augmentations.get('Foo', 'item_actions'))
+        self.assertIs(None, foo_augmentations.get('Bar', 'item_types'))
+        self.assertEqual([], list(self.augmentations.for_plugin('Baz')))
+
+    def test_disabled(self):
+        self.assertEqual([], list(self.augmentations.disabled()))
+        self.foo_actions.is_enabled = False
+        self.bar_types.is_enabled = False
+        disabled = self.augmentations.disabled()
+        self.assertEqual([self.foo_actions, self.bar_types], list(disabled))
+        self.assertEqual([self.bar_types], list(disabled.for_plugin('Bar')))
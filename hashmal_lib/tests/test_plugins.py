@@ -5,7 +5,7 @@ from bitcoin.core import b2lx
 
 from hashmal_lib.plugins.addr_encoder import encode_address, decode_address
 from hashmal_lib.plugins.block_analyzer import deserialize_block_or_header
-from hashmal_lib.plugins import script_gen
+from hashmal_lib.plugins import script_gen, item_types
 from hashmal_lib.plugins.variables import classify_data
 from hashmal_lib.core import chainparams, Script
 
@@ -28,6 +28,43 @@ class VariablesTest(unittest.TestCase):
             categories = classify_data(data)
             self.assertEqual(set(categories), set(classification), 'Incorrect classification for %s: %s' % (data, categories))
 
+class ItemTypesTest(unittest.TestCase):
+    def setUp(self):
+        self.saved_actions = list(item_types.item_actions)
+        item_types._actions_by_type.clear()
+        # Augmentation callbacks don't need a handler.
+        self.items_plugin = item_types.ItemsPlugin.__new__(item_types.ItemsPlugin)
+
+    def tearDown(self):
+        item_types.item_actions[:] = self.saved_actions
+        item_types._actions_by_type.clear()
+
+    def test_get_actions_is_cached(self):
+        func = lambda item: None
+        self.items_plugin.on_item_actions_augmented(item_types.ItemAction('Foo', 'Test Item', 'Do Foo', func))
+        actions = item_types.get_actions('Test Item')
+        self.assertEqual({'Foo': (('Do Foo', func),)}, actions)
+        self.assertIn('Test Item', item_types._actions_by_type)
+
+        # Actions added without augmentation aren't seen until the cache is cleared.
+        item_types.item_actions.append(item_types.ItemAction('Bar', 'Test Item', 'Do Bar', func))
+        self.assertEqual(['Foo'], item_types.get_actions('Test Item').keys())
+
+        # Changing a result doesn't change the cache.
+        actions['Baz'] = ()
+        del actions['Foo']
+        self.assertEqual({'Foo': (('Do Foo', func),)}, item_types.get_actions('Test Item'))
+
+    def test_augmenting_actions_clears_cache(self):
+        func = lambda item: None
+        self.items_plugin.on_item_actions_augmented(item_types.ItemAction('Foo', 'Test Item', 'Do Foo', func))
+        self.assertEqual(['Foo'], item_types.get_actions('Test Item').keys())
+
+        self.items_plugin.on_item_actions_augmented([item_types.ItemAction('Bar', 'Test Item', 'Do Bar', func)])
+        actions = item_types.get_actions('Test Item')
+        self.assertEqual(['Bar', 'Foo'], sorted(actions.keys()))
+        self.assertEqual((('Do Bar', func),), actions['Bar'])
+
 class BlockAnalyzerTest(unittest.TestCase):
     btc_genesis = '0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81bc3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c0101000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000'
     btc_genesis_header = btc_genesis[:160]
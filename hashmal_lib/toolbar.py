@@ -99,7 +99,7 @@ class FavoritesSelector(QWidget):
             return
         name = str(self.combo.currentText())
         plugin = self.gui.plugin_handler.get_plugin(name)
-        if plugin and plugin.has_gui:
+        if plugin and plugin.has_gui and plugin.is_enabled:
             self.gui.plugin_handler.bring_to_front(plugin.ui)
         self.combo.setCurrentIndex(0)
 